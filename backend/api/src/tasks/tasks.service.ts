@@ -30,6 +30,7 @@ export class TasksService {
           title: task.title,
           description: task.description,
           priority: task.priority,
+          userId,
         })
       )
     } catch (error) {
@@ -109,6 +110,7 @@ export class TasksService {
           taskId: id,
           feedback: reviseTaskDto.feedback,
           previousAnswer: task.finalAnswer,
+          userId,
         })
       )
     } catch (error) {
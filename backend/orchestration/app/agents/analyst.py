@@ -37,7 +37,7 @@ class AnalystAgent(BaseAgent):
 """
 
         # Use Claude Opus for synthesis (better at comprehensive analysis)
-        final_answer = await self.call_anthropic(prompt, max_tokens=4000)
+        final_answer = await self.call_anthropic(prompt, max_tokens=4000, stage="synthesize")
 
         return final_answer
 
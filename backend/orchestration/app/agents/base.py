@@ -1,44 +1,159 @@
 from abc import ABC, abstractmethod
 from typing import Optional, Dict, Any
 import os
-from openai import AsyncOpenAI
-from anthropic import AsyncAnthropic
+import time
+
+from app.services.usage import ledger, scheduler, DEFAULT_TENANT
+from app.services.clients import get_openai_client, get_anthropic_client
+from app.services.completion_stats import completion_stats
+from app.services.capture import capture, current_call
+
+MAX_CONTINUATIONS = int(os.getenv("AI_MAX_CONTINUATIONS", "2"))
+CONTINUE_PROMPT = "Продолжите ответ ровно с того места, где он оборвался, без повторов."
 
 class BaseAgent(ABC):
-    def __init__(self, agent_id: str, name: str):
+    def __init__(self, agent_id: str, name: str, tenant_id: str = DEFAULT_TENANT):
         self.agent_id = agent_id
         self.name = name
-        self.openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.anthropic_client = AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+        self.tenant_id = tenant_id
+
+    @property
+    def openai_client(self):
+        return get_openai_client()
+
+    @property
+    def anthropic_client(self):
+        return get_anthropic_client()
+
+    @property
+    def role_name(self) -> str:
+        """Role used to group completion length statistics"""
+        return self.__class__.__name__.replace("Agent", "").lower()
 
     @abstractmethod
     async def execute(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Execute the agent's main task"""
         pass
 
-    async def call_openai(self, prompt: str, model: str = "gpt-4-turbo-preview", max_tokens: int = 4000) -> str:
-        """Helper to call OpenAI API"""
+    async def call_openai(self, prompt: str, model: str = "gpt-4-turbo-preview", max_tokens: int = 4000, stage: str = "default", structured: bool = False) -> str:
+        """
+        Helper to call OpenAI API.
+
+        Every stage starts with an adaptive max_tokens. Truncated free-text
+        answers are continued. `structured` stages (JSON output) are never
+        continued, since a continued JSON fragment rarely parses: the fragment
+        is discarded and the call is retried once at the configured max_tokens.
+        """
+        ledger.check_budget(self.tenant_id)
+        stats_key = (stage, self.role_name, model)
+        limit = completion_stats.suggest(stats_key, max_tokens)
+        extra_calls = 1 if structured else MAX_CONTINUATIONS
+        messages = [{"role": "user", "content": prompt}]
+        current_call.set((stage, self.role_name))
         try:
-            response = await self.openai_client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=max_tokens,
-                temperature=0.7,
-            )
-            return response.choices[0].message.content
+            parts = []
+            completion_tokens = 0
+            truncated = False
+            continuation = 0
+            for attempt in range(extra_calls + 1):
+                call_max_tokens = limit if attempt == 0 else max_tokens
+                queued_at = time.perf_counter()
+                async with scheduler.slot(self.tenant_id):
+                    started_at = time.perf_counter()
+                    response = await self.openai_client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=call_max_tokens,
+                        temperature=0.7,
+                    )
+                    finished_at = time.perf_counter()
+                if response.usage:
+                    ledger.record(self.tenant_id, model, response.usage.prompt_tokens, response.usage.completion_tokens)
+                    completion_tokens += response.usage.completion_tokens
+                parts.append(response.choices[0].message.content or "")
+                capture.record_call(
+                    "openai", model, stage, self.role_name, self.tenant_id,
+                    prompt, continuation, call_max_tokens,
+                    parts[-1], response.choices[0].finish_reason,
+                    response.usage.prompt_tokens if response.usage else None,
+                    response.usage.completion_tokens if response.usage else None,
+                    (started_at - queued_at) * 1000, (finished_at - started_at) * 1000,
+                )
+                if attempt == 0:
+                    truncated = response.choices[0].finish_reason == "length"
+                if response.choices[0].finish_reason != "length":
+                    break
+                if structured:
+                    if call_max_tokens >= max_tokens:
+                        break
+                    # Discard the JSON fragment and ask again at the ceiling
+                    parts = []
+                    completion_tokens = 0
+                    continue
+                continuation += 1
+                messages = messages + [
+                    {"role": "assistant", "content": parts[-1]},
+                    {"role": "user", "content": CONTINUE_PROMPT},
+                ]
+            completion_stats.observe(stats_key, completion_tokens, truncated=truncated)
+            return "".join(parts)
         except Exception as e:
             print(f"OpenAI API error: {e}")
             return f"Error calling AI: {str(e)}"
 
-    async def call_anthropic(self, prompt: str, model: str = "claude-opus-4-20250514", max_tokens: int = 4000) -> str:
-        """Helper to call Anthropic Claude API"""
+    async def call_anthropic(self, prompt: str, model: str = "claude-opus-4-20250514", max_tokens: int = 4000, stage: str = "default", structured: bool = False) -> str:
+        """Helper to call Anthropic Claude API; see call_openai for `structured`"""
+        ledger.check_budget(self.tenant_id)
+        stats_key = (stage, self.role_name, model)
+        limit = completion_stats.suggest(stats_key, max_tokens)
+        extra_calls = 1 if structured else MAX_CONTINUATIONS
+        messages = [{"role": "user", "content": prompt}]
+        current_call.set((stage, self.role_name))
         try:
-            response = await self.anthropic_client.messages.create(
-                model=model,
-                max_tokens=max_tokens,
-                messages=[{"role": "user", "content": prompt}],
-            )
-            return response.content[0].text
+            text = ""
+            completion_tokens = 0
+            truncated = False
+            continuation = 0
+            for attempt in range(extra_calls + 1):
+                call_max_tokens = limit if attempt == 0 else max_tokens
+                queued_at = time.perf_counter()
+                async with scheduler.slot(self.tenant_id):
+                    started_at = time.perf_counter()
+                    response = await self.anthropic_client.messages.create(
+                        model=model,
+                        max_tokens=call_max_tokens,
+                        messages=messages,
+                    )
+                    finished_at = time.perf_counter()
+                if response.usage:
+                    ledger.record(self.tenant_id, model, response.usage.input_tokens, response.usage.output_tokens)
+                    completion_tokens += response.usage.output_tokens
+                chunk = response.content[0].text if response.content else ""
+                text += chunk
+                capture.record_call(
+                    "anthropic", model, stage, self.role_name, self.tenant_id,
+                    prompt, continuation, call_max_tokens, chunk, response.stop_reason,
+                    response.usage.input_tokens if response.usage else None,
+                    response.usage.output_tokens if response.usage else None,
+                    (started_at - queued_at) * 1000, (finished_at - started_at) * 1000,
+                )
+                if attempt == 0:
+                    truncated = response.stop_reason == "max_tokens"
+                if response.stop_reason != "max_tokens":
+                    break
+                if structured:
+                    if call_max_tokens >= max_tokens:
+                        break
+                    # Discard the JSON fragment and ask again at the ceiling
+                    text = ""
+                    completion_tokens = 0
+                    continue
+                continuation += 1
+                # Prefill the partial answer so Claude continues it in place
+                text = text.rstrip()
+                messages = [messages[0], {"role": "assistant", "content": text}]
+            completion_stats.observe(stats_key, completion_tokens, truncated=truncated)
+            return text
         except Exception as e:
             print(f"Anthropic API error: {e}")
             return f"Error calling AI: {str(e)}"
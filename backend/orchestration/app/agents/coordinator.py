@@ -40,7 +40,7 @@ class CoordinatorAgent(BaseAgent):
 }}
 """
 
-        response = await self.call_openai(prompt, max_tokens=2000)
+        response = await self.call_openai(prompt, max_tokens=2000, stage="coordinate", structured=True)
 
         try:
             return json.loads(response)
@@ -42,7 +42,7 @@ class ManagerAgent(BaseAgent):
 }}
 """
 
-        response = await self.call_openai(prompt)
+        response = await self.call_openai(prompt, stage="analyze", structured=True)
 
         try:
             # Parse JSON response
@@ -81,7 +81,7 @@ class ManagerAgent(BaseAgent):
 }}
 """
 
-            response = await self.call_openai(prompt, max_tokens=500)
+            response = await self.call_openai(prompt, max_tokens=500, stage="create_subtasks", structured=True)
 
             try:
                 subtask_data = json.loads(response)
@@ -124,7 +124,7 @@ class ManagerAgent(BaseAgent):
 }}
 """
 
-        response = await self.call_openai(prompt, max_tokens=800)
+        response = await self.call_openai(prompt, max_tokens=800, stage="review_solution", structured=True)
 
         try:
             return json.loads(response)
@@ -157,7 +157,7 @@ class ManagerAgent(BaseAgent):
 }}
 """
 
-        response = await self.call_openai(prompt, max_tokens=800)
+        response = await self.call_openai(prompt, max_tokens=800, stage="review_final", structured=True)
 
         try:
             return json.loads(response)
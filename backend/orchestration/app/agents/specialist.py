@@ -1,30 +1,93 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
+import os
+import re
 from .base import BaseAgent
-from app.models.task import SpecialistRole
+from app.models.task import SpecialistRole, SubtaskModel
+from app.services.usage import DEFAULT_TENANT
+
+ROLE_PROMPTS = {
+    SpecialistRole.DEVELOPER: "Вы - опытный разработчик. Предоставьте техническое решение с примерами кода, архитектурными решениями.",
+    SpecialistRole.RESEARCHER: "Вы - исследователь. Проведите анализ, найдите релевантную информацию, предоставьте данные и источники.",
+    SpecialistRole.ANALYST: "Вы - бизнес-аналитик. Проанализируйте требования, создайте спецификации, оцените бизнес-ценность.",
+    SpecialistRole.DESIGNER: "Вы - UX/UI дизайнер. Создайте концепцию дизайна, опишите пользовательский опыт.",
+    SpecialistRole.DATA_SCIENTIST: "Вы - Data Scientist. Примените методы машинного обучения, анализа данных.",
+    SpecialistRole.WRITER: "Вы - профессиональный писатель. Создайте качественный контент, документацию.",
+    SpecialistRole.QA_ENGINEER: "Вы - QA инженер. Разработайте стратегию тестирования, опишите тест-кейсы.",
+}
+
+# Roles whose subtasks can share one merged prompt without hurting each other
+MERGE_GROUPS = [
+    {SpecialistRole.WRITER, SpecialistRole.ANALYST, SpecialistRole.RESEARCHER},
+    {SpecialistRole.DEVELOPER, SpecialistRole.QA_ENGINEER},
+    {SpecialistRole.DESIGNER, SpecialistRole.WRITER},
+]
+
+MERGE_ENABLED = os.getenv("SPECIALIST_MERGE_ENABLED", "false").lower() == "true"
+MERGE_MAX_SUBTASKS = int(os.getenv("SPECIALIST_MERGE_MAX", "2"))
+# Output token ceiling of the specialist model (gpt-4-turbo-preview: 4096);
+# a merged call cannot ask for more than this
+MODEL_MAX_OUTPUT_TOKENS = int(os.getenv("SPECIALIST_MODEL_MAX_OUTPUT_TOKENS", "4096"))
+MERGE_COMPLEXITIES = {c.strip() for c in os.getenv("SPECIALIST_MERGE_COMPLEXITY", "low").split(",")}
+
+SECTION_MARKER = "=== SECTION {id} ==="
+SECTION_PATTERN = re.compile(r"^=== SECTION (\S+) ===\s*$", re.MULTILINE)
+
+
+def group_subtasks(subtasks: List[SubtaskModel], complexity: str, max_size: int = MERGE_MAX_SUBTASKS) -> List[List[SubtaskModel]]:
+    """
+    Group compatible subtasks for merged execution.
+
+    Only tasks whose analysed complexity is in SPECIALIST_MERGE_COMPLEXITY are
+    merged; everything else runs one subtask per call.
+    """
+    if complexity not in MERGE_COMPLEXITIES or max_size < 2:
+        return [[subtask] for subtask in subtasks]
+
+    groups: List[List[SubtaskModel]] = []
+    for subtask in subtasks:
+        for group in groups:
+            roles = {s.role for s in group} | {subtask.role}
+            if (
+                len(group) < max_size
+                and subtask.role not in {s.role for s in group}
+                and any(roles <= allowed for allowed in MERGE_GROUPS)
+            ):
+                group.append(subtask)
+                break
+        else:
+            groups.append([subtask])
+    return groups
+
+
+def split_sections(response: str, subtask_ids: List[str]) -> Dict[str, str]:
+    """Split a merged response into per-subtask solutions by section markers"""
+    matches = list(SECTION_PATTERN.finditer(response))
+    sections = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(response)
+        subtask_id = match.group(1)
+        if subtask_id in subtask_ids:
+            sections[subtask_id] = response[match.end():end].strip()
+    return {k: v for k, v in sections.items() if v}
+
 
 class SpecialistAgent(BaseAgent):
     """
     Specialist agent solves assigned subtasks based on their role
     """
 
-    def __init__(self, agent_id: str, name: str, role: SpecialistRole):
-        super().__init__(agent_id, name)
+    def __init__(self, agent_id: str, name: str, role: SpecialistRole, tenant_id: str = DEFAULT_TENANT):
+        super().__init__(agent_id, name, tenant_id)
         self.role = role
 
+    @property
+    def role_name(self) -> str:
+        return self.role.value
+
     async def solve_subtask(self, subtask: Dict[str, Any], main_task_context: str = "") -> str:
         """Solve the assigned subtask"""
 
-        role_prompts = {
-            SpecialistRole.DEVELOPER: "Вы - опытный разработчик. Предоставьте техническое решение с примерами кода, архитектурными решениями.",
-            SpecialistRole.RESEARCHER: "Вы - исследователь. Проведите анализ, найдите релевантную информацию, предоставьте данные и источники.",
-            SpecialistRole.ANALYST: "Вы - бизнес-аналитик. Проанализируйте требования, создайте спецификации, оцените бизнес-ценность.",
-            SpecialistRole.DESIGNER: "Вы - UX/UI дизайнер. Создайте концепцию дизайна, опишите пользовательский опыт.",
-            SpecialistRole.DATA_SCIENTIST: "Вы - Data Scientist. Примените методы машинного обучения, анализа данных.",
-            SpecialistRole.WRITER: "Вы - профессиональный писатель. Создайте качественный контент, документацию.",
-            SpecialistRole.QA_ENGINEER: "Вы - QA инженер. Разработайте стратегию тестирования, опишите тест-кейсы.",
-        }
-
-        role_prompt = role_prompts.get(self.role, "Вы - специалист.")
+        role_prompt = ROLE_PROMPTS.get(self.role, "Вы - специалист.")
 
         prompt = f"""
 {role_prompt}
@@ -41,7 +104,7 @@ class SpecialistAgent(BaseAgent):
 """
 
         # Use OpenAI for most specialists
-        solution = await self.call_openai(prompt, max_tokens=3000)
+        solution = await self.call_openai(prompt, max_tokens=3000, stage="solve_subtask")
 
         return solution
 
@@ -57,3 +120,72 @@ class SpecialistAgent(BaseAgent):
             "solution": solution,
             "specialist_role": self.role.value
         }
+
+
+class MergedSpecialistAgent(BaseAgent):
+    """
+    Solves several compatible subtasks in one LLM call with a multi-section
+    prompt, sharing the main task context between them
+    """
+
+    def __init__(self, agent_id: str, name: str, roles: List[SpecialistRole], tenant_id: str = DEFAULT_TENANT):
+        super().__init__(agent_id, name, tenant_id)
+        self.roles = roles
+
+    @property
+    def role_name(self) -> str:
+        return "+".join(sorted(role.value for role in self.roles))
+
+    async def solve_subtasks(self, subtasks: List[Dict[str, Any]], main_task_context: str = "") -> Dict[str, str]:
+        """Solve all subtasks in one call and split the answer per subtask"""
+
+        max_tokens = min(3000 * len(subtasks), MODEL_MAX_OUTPUT_TOKENS)
+
+        sections = "\n\n".join([
+            f"""{SECTION_MARKER.format(id=subtask.get('id'))}
+Роль: {ROLE_PROMPTS.get(SpecialistRole(subtask.get('role')), 'Вы - специалист.')}
+Название: {subtask.get('title')}
+Описание: {subtask.get('description')}"""
+            for subtask in subtasks
+        ])
+
+        prompt = f"""
+Вы - команда специалистов. Каждую подзадачу ниже решите отдельно, в указанной для неё роли.
+
+Контекст основной задачи: {main_task_context}
+
+Подзадачи:
+
+{sections}
+
+Для каждой подзадачи предоставьте детальное, профессиональное решение.
+Ответ целиком должен уложиться примерно в {max_tokens} токенов, распределите объём между подзадачами.
+Структурируйте ответ, используйте списки, примеры где необходимо.
+Будьте конкретны и практичны.
+
+Формат ответа: начните решение каждой подзадачи с отдельной строки-маркера
+точно в таком виде, как выше (например "{SECTION_MARKER.format(id=subtasks[0].get('id'))}"),
+и не используйте эти маркеры больше нигде.
+"""
+
+        response = await self.call_openai(prompt, max_tokens=max_tokens, stage="solve_merged")
+
+        return split_sections(response, [subtask.get("id") for subtask in subtasks])
+
+    async def execute(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Main execution method"""
+        subtasks = context.get("subtasks", [])
+        main_task_context = context.get("main_task_context", "")
+
+        solutions = await self.solve_subtasks(subtasks, main_task_context)
+
+        return {
+            "solutions": [
+                {
+                    "subtask_id": subtask.get("id"),
+                    "solution": solutions.get(subtask.get("id")),
+                    "specialist_role": SpecialistRole(subtask.get("role")).value
+                }
+                for subtask in subtasks
+            ]
+        }
@@ -1,13 +1,63 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+import asyncio
 import os
+import time
 
-from app.workflows.orchestrator import router as orchestrator_router
+from app.workflows.orchestrator import router as orchestrator_router, backend
+from app.services.clients import warm_up_providers, close_clients
+from app.services.capture import capture
+
+readiness = {"ready": False, "warmup_seconds": None, "attempts": 0}
+
+WARMUP_MAX_BACKOFF = float(os.getenv("WARMUP_MAX_BACKOFF_SECONDS", "30"))
+
+async def warm_up():
+    """
+    Pre-establish provider and backend connections so the first task does not
+    pay for DNS, TLS and HTTP/2 setup. Retries with backoff until every
+    connection succeeds; only then does /ready report ready.
+    """
+    started = time.perf_counter()
+    backoff = 1.0
+    while True:
+        readiness["attempts"] += 1
+        results = await asyncio.gather(warm_up_providers(), backend.warm_up())
+        if all(results):
+            break
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, WARMUP_MAX_BACKOFF)
+
+    readiness["warmup_seconds"] = round(time.perf_counter() - started, 3)
+    readiness["ready"] = True
+    print(f"Orchestration warm-up finished in {readiness['warmup_seconds']}s")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so the server accepts /health and /ready
+    # (503 until warm) while connections are being established
+    warmup_task = None
+    if os.getenv("WARMUP_ENABLED", "true").lower() == "true":
+        warmup_task = asyncio.create_task(warm_up())
+    else:
+        readiness["ready"] = True
+
+    yield
+
+    readiness["ready"] = False
+    if warmup_task is not None:
+        warmup_task.cancel()
+    await backend.close()
+    await close_clients()
+    await asyncio.to_thread(capture.close)
 
 app = FastAPI(
     title="MixMyAI Orchestration Service",
     description="Multi-agent orchestration and AI integration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS
@@ -26,6 +76,17 @@ app.include_router(orchestrator_router, prefix="/api/orchestration", tags=["orch
 async def health_check():
     return {"status": "ok", "service": "orchestration"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: succeeds only after connection warm-up has finished"""
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content={
+            "status": "warming_up",
+            "service": "orchestration",
+            "attempts": readiness["attempts"]
+        })
+    return {"status": "ready", "service": "orchestration", "warmupSeconds": readiness["warmup_seconds"]}
+
 @app.get("/")
 async def root():
     return {
@@ -41,11 +41,15 @@ class StartTaskRequest(BaseModel):
     title: str
     description: str
     priority: TaskPriority
+    userId: Optional[str] = None
+    tenantId: Optional[str] = None
 
 class ReviseTaskRequest(BaseModel):
     taskId: str
     feedback: str
     previousAnswer: Optional[str] = None
+    userId: Optional[str] = None
+    tenantId: Optional[str] = None
 
 class SubtaskModel(BaseModel):
     id: str
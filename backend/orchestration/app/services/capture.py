@@ -0,0 +1,175 @@
+from typing import Dict, Any, Optional, Callable, List, Tuple
+from contextvars import ContextVar
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+# Task being processed by the current workflow; asyncio tasks spawned by the
+# workflow inherit it, so provider calls can be attributed without threading
+# the id through every agent.
+current_task_id: ContextVar[Optional[str]] = ContextVar("current_task_id", default=None)
+
+# One workflow run; revisions reuse the task id, so replays key on this
+current_run_id: ContextVar[Optional[str]] = ContextVar("current_run_id", default=None)
+
+# (stage, role) of the provider call in flight, set by BaseAgent
+current_call: ContextVar[Optional[Tuple[str, str]]] = ContextVar("current_call", default=None)
+
+Redactor = Callable[[str], str]
+
+
+class ProviderCapture:
+    """
+    Opt-in, append-only JSONL capture of provider traffic.
+
+    Each line is either a `task` record (workflow start) or a `call` record
+    (one provider request with stage, role, token counts, timings and the
+    response body). All free text passes through the registered redactors
+    before it is written.
+
+    Records are handed to a background thread that owns the open file, so
+    capturing does not block the event loop serving the traffic it measures.
+    """
+
+    def __init__(self, path: Optional[str] = None, include_prompts: bool = False):
+        self.path = path
+        self.include_prompts = include_prompts
+        self._redactors: List[Redactor] = []
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def add_redactor(self, redactor: Redactor):
+        """Register a function applied to every prompt/response text before writing"""
+        self._redactors.append(redactor)
+
+    def redact(self, text: Optional[str]) -> Optional[str]:
+        if text is None:
+            return None
+        for redactor in self._redactors:
+            text = redactor(text)
+        return text
+
+    def _write(self, record: Dict[str, Any]):
+        with self._writer_lock:
+            if self._writer is None:
+                # Open here so a bad path disables capture once instead of
+                # queueing records that no writer will ever drain
+                try:
+                    f = open(self.path, "a", encoding="utf-8")
+                except OSError as e:
+                    print(f"Failed to open provider capture, disabling it: {e}")
+                    self.path = None
+                    return
+                self._writer = threading.Thread(target=self._drain, args=(f,), name="provider-capture", daemon=True)
+                self._writer.start()
+        self._queue.put(record)
+
+    def _drain(self, f):
+        with f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                try:
+                    f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+                    if self._queue.empty():
+                        f.flush()
+                except (OSError, TypeError, ValueError) as e:
+                    print(f"Failed to write provider capture: {e}")
+
+    def close(self):
+        """Flush queued records and stop the writer thread"""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join()
+
+    def record_task(self, task_id: str, tenant_id: str, title: str, description: str, priority: str):
+        current_run_id.set(f"{task_id}:{uuid.uuid4().hex[:8]}")
+        if not self.enabled:
+            return
+        self._write({
+            "type": "task",
+            "ts": time.time(),
+            "run_id": current_run_id.get(),
+            "task_id": task_id,
+            "tenant_id": tenant_id,
+            "title": self.redact(title),
+            "description": self.redact(description),
+            "priority": priority,
+        })
+
+    def record_call(
+        self,
+        provider: str,
+        model: str,
+        stage: str,
+        role: str,
+        tenant_id: str,
+        prompt: str,
+        continuation: int,
+        max_tokens: int,
+        response_text: str,
+        finish_reason: Optional[str],
+        input_tokens: Optional[int],
+        output_tokens: Optional[int],
+        queued_ms: float,
+        latency_ms: float,
+    ):
+        if not self.enabled:
+            return
+        record = {
+            "type": "call",
+            "ts": time.time(),
+            "run_id": current_run_id.get(),
+            "task_id": current_task_id.get(),
+            "tenant_id": tenant_id,
+            "provider": provider,
+            "model": model,
+            "stage": stage,
+            "role": role,
+            "continuation": continuation,
+            "max_tokens": max_tokens,
+            "prompt_chars": len(prompt),
+            "prompt_sha256": hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16],
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "finish_reason": finish_reason,
+            "queued_ms": round(queued_ms, 1),
+            "latency_ms": round(latency_ms, 1),
+            "response": self.redact(response_text),
+        }
+        if self.include_prompts:
+            record["prompt"] = self.redact(prompt)
+        self._write(record)
+
+
+def load_capture(path: str) -> List[Dict[str, Any]]:
+    """Read a capture file, skipping lines that fail to parse"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"Skipping malformed capture line: {line[:80]}")
+    return records
+
+
+capture = ProviderCapture(
+    path=os.getenv("PROVIDER_CAPTURE_PATH") or None,
+    include_prompts=os.getenv("PROVIDER_CAPTURE_PROMPTS", "false").lower() == "true",
+)
@@ -0,0 +1,106 @@
+from typing import Optional, Any
+import asyncio
+import os
+import httpx
+
+# Provider SDKs are imported on first use so that worker start-up and
+# health checks do not pay for loading them.
+_http_client: Optional[httpx.AsyncClient] = None
+_openai_client: Optional[Any] = None
+_anthropic_client: Optional[Any] = None
+
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "5"))
+
+# Per-request timeout passed explicitly to the SDKs; matches their own 600s
+# default so long completions are not cut off by the shared pool settings
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "600"))
+
+# How long idle pooled connections are kept. httpx defaults to 5s, which would
+# drop the warmed-up connections before the first real request arrives
+KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "300"))
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared connection pool used by both provider SDKs"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(LLM_REQUEST_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "20")),
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _http_client
+
+
+def get_openai_client():
+    """Process-wide AsyncOpenAI client"""
+    global _openai_client
+    if _openai_client is None:
+        from openai import AsyncOpenAI
+        _openai_client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=get_http_client(),
+            timeout=LLM_REQUEST_TIMEOUT,
+        )
+    return _openai_client
+
+
+def get_anthropic_client():
+    """Process-wide AsyncAnthropic client"""
+    global _anthropic_client
+    if _anthropic_client is None:
+        from anthropic import AsyncAnthropic
+        _anthropic_client = AsyncAnthropic(
+            api_key=os.getenv("ANTHROPIC_API_KEY"),
+            http_client=get_http_client(),
+            timeout=LLM_REQUEST_TIMEOUT,
+        )
+    return _anthropic_client
+
+
+def install_clients(openai_client=None, anthropic_client=None):
+    """Replace the provider clients, e.g. with offline replay clients"""
+    global _openai_client, _anthropic_client
+    if openai_client is not None:
+        _openai_client = openai_client
+    if anthropic_client is not None:
+        _anthropic_client = anthropic_client
+
+
+async def _open_connection(client: httpx.AsyncClient, url: str) -> bool:
+    """Resolve DNS and complete the TLS/HTTP2 handshake; any HTTP response counts"""
+    try:
+        await client.head(url, timeout=WARMUP_TIMEOUT)
+        return True
+    except Exception as e:
+        print(f"Warm-up request to {url} failed: {e}")
+        return False
+
+
+async def warm_up_providers() -> bool:
+    """Build provider clients and open a pooled connection to each provider"""
+    http_client = get_http_client()
+    urls = []
+    for factory in (get_openai_client, get_anthropic_client):
+        try:
+            urls.append(str(factory().base_url))
+        except Exception as e:
+            # e.g. missing API key
+            print(f"Provider client warm-up failed: {e}")
+            return False
+
+    results = await asyncio.gather(*[_open_connection(http_client, url) for url in urls])
+    return all(results)
+
+
+async def close_clients():
+    global _http_client, _openai_client, _anthropic_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _openai_client = None
+    _anthropic_client = None
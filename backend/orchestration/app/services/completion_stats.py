@@ -0,0 +1,72 @@
+from typing import Dict, Any, Tuple, Deque
+from collections import deque
+import math
+import os
+
+StatsKey = Tuple[str, str, str]  # (stage, role, model)
+
+
+class CompletionStats:
+    """
+    Rolling per-(stage, role, model) statistics of actual completion lengths.
+
+    Providers reserve rate-limit capacity against `max_tokens`, so instead of
+    always asking for the hard-coded ceiling we ask for a high percentile of
+    what this kind of call really produces, plus a safety margin. The
+    configured value stays the upper bound, and truncated completions are
+    continued by the caller.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        margin: float = 0.2,
+        min_samples: int = 20,
+        window: int = 200,
+        floor: int = 256,
+    ):
+        self.percentile = percentile
+        self.margin = margin
+        self.min_samples = min_samples
+        self.window = window
+        self.floor = floor
+        self._samples: Dict[StatsKey, Deque[int]] = {}
+        self._truncations: Dict[StatsKey, int] = {}
+
+    def observe(self, key: StatsKey, completion_tokens: int, truncated: bool = False):
+        """Record the total completion length of a finished call"""
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(completion_tokens)
+        if truncated:
+            self._truncations[key] = self._truncations.get(key, 0) + 1
+
+    def _percentile(self, values) -> int:
+        ordered = sorted(values)
+        index = max(math.ceil(self.percentile / 100 * len(ordered)) - 1, 0)
+        return ordered[index]
+
+    def suggest(self, key: StatsKey, ceiling: int) -> int:
+        """max_tokens for the next call: learned estimate capped at `ceiling`"""
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return ceiling
+        estimate = int(self._percentile(samples) * (1 + self.margin))
+        return min(max(estimate, self.floor), ceiling)
+
+    def snapshot(self) -> Dict[str, Any]:
+        result = {}
+        for key, samples in self._samples.items():
+            stage, role, model = key
+            result[f"{stage}/{role}/{model}"] = {
+                "samples": len(samples),
+                f"p{self.percentile:g}": self._percentile(samples),
+                "max": max(samples),
+                "truncations": self._truncations.get(key, 0),
+            }
+        return result
+
+
+completion_stats = CompletionStats(
+    percentile=float(os.getenv("MAX_TOKENS_PERCENTILE", "95")),
+    margin=float(os.getenv("MAX_TOKENS_MARGIN", "0.2")),
+    min_samples=int(os.getenv("MAX_TOKENS_MIN_SAMPLES", "20")),
+)
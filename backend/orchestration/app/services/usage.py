@@ -0,0 +1,263 @@
+from typing import Dict, Any, Optional, Deque
+from collections import deque
+from dataclasses import dataclass
+import asyncio
+import os
+import time
+
+DEFAULT_TENANT = "default"
+
+# Approximate prices in USD per 1K tokens: (input, output)
+MODEL_PRICES = {
+    "gpt-4-turbo-preview": (0.01, 0.03),
+    "gpt-4o": (0.005, 0.015),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "claude-opus-4-20250514": (0.015, 0.075),
+}
+
+
+class BudgetExceededError(Exception):
+    """Raised when a tenant has used up its rolling token or cost budget"""
+
+    def __init__(self, tenant_id: str, message: str):
+        super().__init__(message)
+        self.tenant_id = tenant_id
+
+
+def resolve_tenant(tenant_id: Optional[str] = None, user_id: Optional[str] = None) -> str:
+    """Pick the accounting key for a request: tenant, then user, then default"""
+    return tenant_id or user_id or DEFAULT_TENANT
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """Estimate call cost in USD from the model price table"""
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1000
+
+
+@dataclass
+class UsageRecord:
+    timestamp: float
+    model: str
+    input_tokens: int
+    output_tokens: int
+    cost: float
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+
+class UsageLedger:
+    """
+    In-memory token and cost ledger with per-tenant rolling budgets.
+    A budget of 0 means unlimited.
+    """
+
+    def __init__(self, token_budget: int = 0, cost_budget: float = 0.0, window_seconds: int = 3600):
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+        self.window_seconds = window_seconds
+        self._records: Dict[str, Deque[UsageRecord]] = {}
+        self._totals: Dict[str, Dict[str, Any]] = {}
+
+    def _prune(self, tenant_id: str, now: float) -> Deque[UsageRecord]:
+        records = self._records.setdefault(tenant_id, deque())
+        cutoff = now - self.window_seconds
+        while records and records[0].timestamp < cutoff:
+            records.popleft()
+        return records
+
+    def record(self, tenant_id: str, model: str, input_tokens: int, output_tokens: int) -> UsageRecord:
+        """Record usage reported by a provider response"""
+        now = time.time()
+        entry = UsageRecord(
+            timestamp=now,
+            model=model,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cost=estimate_cost(model, input_tokens, output_tokens),
+        )
+        self._prune(tenant_id, now).append(entry)
+
+        totals = self._totals.setdefault(tenant_id, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0})
+        totals["calls"] += 1
+        totals["input_tokens"] += input_tokens
+        totals["output_tokens"] += output_tokens
+        totals["cost"] += entry.cost
+        return entry
+
+    def window_usage(self, tenant_id: str) -> Dict[str, Any]:
+        """Tokens and cost used by a tenant inside the rolling window"""
+        records = self._prune(tenant_id, time.time())
+        return {
+            "tokens": sum(r.total_tokens for r in records),
+            "cost": sum(r.cost for r in records),
+            "calls": len(records),
+        }
+
+    def check_budget(self, tenant_id: str):
+        """Raise BudgetExceededError if the tenant is over its rolling budget"""
+        usage = self.window_usage(tenant_id)
+        if self.token_budget and usage["tokens"] >= self.token_budget:
+            raise BudgetExceededError(
+                tenant_id,
+                f"Token budget exceeded for tenant {tenant_id}: {usage['tokens']}/{self.token_budget} tokens in {self.window_seconds}s"
+            )
+        if self.cost_budget and usage["cost"] >= self.cost_budget:
+            raise BudgetExceededError(
+                tenant_id,
+                f"Cost budget exceeded for tenant {tenant_id}: ${usage['cost']:.2f}/${self.cost_budget:.2f} in {self.window_seconds}s"
+            )
+
+    def summary(self, tenant_id: str) -> Dict[str, Any]:
+        """Rolling window usage, budgets and lifetime totals for a tenant"""
+        return {
+            "tenantId": tenant_id,
+            "window": self.window_usage(tenant_id),
+            "windowSeconds": self.window_seconds,
+            "tokenBudget": self.token_budget,
+            "costBudget": self.cost_budget,
+            "totals": self._totals.get(tenant_id, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0}),
+        }
+
+
+class FairShareScheduler:
+    """
+    Weighted fair-share admission for LLM calls.
+
+    At most `max_concurrency` calls run at once. When calls queue up, the next
+    slot goes to the waiting tenant with the lowest weighted service so far,
+    so one tenant's burst of parallel specialists cannot starve the others.
+
+    Service is measured against a virtual time: the lowest service among
+    tenants that currently have running or queued calls. A tenant that becomes
+    active again is raised to that virtual time, so credit saved up while idle
+    cannot be spent to starve tenants that stayed busy.
+    """
+
+    def __init__(self, max_concurrency: int = 8, weights: Optional[Dict[str, float]] = None):
+        self.max_concurrency = max_concurrency
+        self.weights = weights or {}
+        self._running = 0
+        self._running_by_tenant: Dict[str, int] = {}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {}
+        self._service: Dict[str, float] = {}
+        self._vtime = 0.0
+
+    def _weight(self, tenant_id: str) -> float:
+        return max(self.weights.get(tenant_id, 1.0), 0.001)
+
+    def _is_active(self, tenant_id: str) -> bool:
+        return self._running_by_tenant.get(tenant_id, 0) > 0 or bool(self._waiters.get(tenant_id))
+
+    def _virtual_time(self) -> float:
+        active = [
+            service for tenant_id, service in self._service.items()
+            if self._is_active(tenant_id)
+        ]
+        if active:
+            self._vtime = max(self._vtime, min(active))
+        return self._vtime
+
+    def _activate(self, tenant_id: str):
+        """Bring a tenant that had nothing running or queued up to virtual time"""
+        if self._is_active(tenant_id):
+            return
+        self._service[tenant_id] = max(self._service.get(tenant_id, 0.0), self._virtual_time())
+
+    def _grant(self, tenant_id: str):
+        self._running += 1
+        self._running_by_tenant[tenant_id] = self._running_by_tenant.get(tenant_id, 0) + 1
+        self._service[tenant_id] += 1.0 / self._weight(tenant_id)
+
+    def _has_waiters(self) -> bool:
+        return any(self._waiters.values())
+
+    def _wake_next(self):
+        while self._running < self.max_concurrency and self._has_waiters():
+            tenant_id = min(
+                (t for t, q in self._waiters.items() if q),
+                key=lambda t: self._service[t]
+            )
+            future = self._waiters[tenant_id].popleft()
+            if future.done():
+                continue
+            self._grant(tenant_id)
+            future.set_result(None)
+
+    async def acquire(self, tenant_id: str):
+        self._activate(tenant_id)
+        if self._running < self.max_concurrency and not self._has_waiters():
+            self._grant(tenant_id)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(tenant_id, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just before cancellation; hand it on
+                self.release(tenant_id)
+            raise
+
+    def release(self, tenant_id: str):
+        self._running -= 1
+        if self._running_by_tenant[tenant_id] == 1:
+            # Record virtual time while this tenant still counts as active
+            self._virtual_time()
+            del self._running_by_tenant[tenant_id]
+        else:
+            self._running_by_tenant[tenant_id] -= 1
+        self._wake_next()
+
+    def slot(self, tenant_id: str) -> "_Slot":
+        """Async context manager holding a scheduler slot for one call"""
+        return _Slot(self, tenant_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._running,
+            "maxConcurrency": self.max_concurrency,
+            "queued": {t: len(q) for t, q in self._waiters.items() if q},
+        }
+
+
+class _Slot:
+    def __init__(self, scheduler: FairShareScheduler, tenant_id: str):
+        self.scheduler = scheduler
+        self.tenant_id = tenant_id
+
+    async def __aenter__(self):
+        await self.scheduler.acquire(self.tenant_id)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.scheduler.release(self.tenant_id)
+
+
+def _parse_weights(raw: str) -> Dict[str, float]:
+    """Parse TENANT_WEIGHTS in the form "tenant_a:2,tenant_b:0.5" """
+    weights: Dict[str, float] = {}
+    for item in raw.split(","):
+        if ":" not in item:
+            continue
+        tenant_id, weight = item.split(":", 1)
+        try:
+            weights[tenant_id.strip()] = float(weight)
+        except ValueError:
+            print(f"Ignoring invalid tenant weight: {item}")
+    return weights
+
+
+ledger = UsageLedger(
+    token_budget=int(os.getenv("TENANT_TOKEN_BUDGET", "0")),
+    cost_budget=float(os.getenv("TENANT_COST_BUDGET", "0")),
+    window_seconds=int(os.getenv("TENANT_BUDGET_WINDOW_SECONDS", "3600")),
+)
+
+scheduler = FairShareScheduler(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    weights=_parse_weights(os.getenv("TENANT_WEIGHTS", "")),
+)
@@ -3,11 +3,15 @@ from typing import Dict, Any, List
 import asyncio
 import httpx
 
-from app.models.task import StartTaskRequest, ReviseTaskRequest, AgentType, SpecialistRole
+from app.models.task import StartTaskRequest, ReviseTaskRequest, AgentType, SpecialistRole, SubtaskModel
 from app.agents.manager import ManagerAgent
-from app.agents.specialist import SpecialistAgent
+from app.agents.specialist import SpecialistAgent, MergedSpecialistAgent, group_subtasks, MERGE_ENABLED
 from app.agents.coordinator import CoordinatorAgent
 from app.agents.analyst import AnalystAgent
+from app.services.usage import ledger, scheduler, resolve_tenant
+from app.services.completion_stats import completion_stats
+from app.services.capture import capture, current_task_id
+from app.services.clients import KEEPALIVE_EXPIRY
 
 router = APIRouter()
 
@@ -15,31 +19,55 @@ router = APIRouter()
 class BackendClient:
     def __init__(self):
         self.api_url = "http://api:4000"  # Docker service name
+        self._client: httpx.AsyncClient = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Keep-alive connection pool reused across status updates"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.api_url,
+                timeout=10.0,
+                limits=httpx.Limits(keepalive_expiry=KEEPALIVE_EXPIRY)
+            )
+        return self._client
+
+    async def warm_up(self) -> bool:
+        """Open a pooled connection to the backend API ahead of the first task"""
+        try:
+            await self.client.head("/")
+            return True
+        except Exception as e:
+            print(f"Backend warm-up failed: {e}")
+            return False
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def update_task(self, task_id: str, status: str, data: Dict = None):
         """Update task status in backend"""
         try:
-            async with httpx.AsyncClient() as client:
-                await client.post(
-                    f"{self.api_url}/api/tasks/{task_id}/update",
-                    json={"status": status, **(data or {})}
-                )
+            await self.client.post(
+                f"/api/tasks/{task_id}/update",
+                json={"status": status, **(data or {})}
+            )
         except Exception as e:
             print(f"Failed to update task: {e}")
 
     async def broadcast_event(self, task_id: str, event_type: str, message: str, data: Dict = None):
         """Broadcast event via WebSocket"""
         try:
-            async with httpx.AsyncClient() as client:
-                await client.post(
-                    f"{self.api_url}/api/websocket/broadcast",
-                    json={
-                        "task_id": task_id,
-                        "event_type": event_type,
-                        "message": message,
-                        "data": data or {}
-                    }
-                )
+            await self.client.post(
+                "/api/websocket/broadcast",
+                json={
+                    "task_id": task_id,
+                    "event_type": event_type,
+                    "message": message,
+                    "data": data or {}
+                }
+            )
         except Exception as e:
             print(f"Failed to broadcast event: {e}")
 
@@ -50,18 +78,82 @@ backend = BackendClient()
 class TaskOrchestrator:
     """Main orchestrator for multi-agent workflow"""
 
+    @staticmethod
+    async def run_specialists(
+        subtasks: List[SubtaskModel],
+        main_task_context: str,
+        tenant_id: str,
+        merge: bool = False,
+        complexity: str = "medium"
+    ) -> List[Dict[str, Any]]:
+        """
+        Run all subtasks in parallel and return solutions in subtask order.
+        With `merge`, compatible subtasks share one call; sections missing
+        from a merged answer are re-run individually.
+        """
+        groups = group_subtasks(subtasks, complexity) if merge else [[subtask] for subtask in subtasks]
+
+        specialist_tasks = []
+        for i, group in enumerate(groups):
+            if len(group) == 1:
+                subtask = group[0]
+                specialist = SpecialistAgent(
+                    f"specialist_{i}",
+                    f"{subtask.role.value.title()} Specialist",
+                    subtask.role,
+                    tenant_id
+                )
+                task = specialist.execute({
+                    "subtask": subtask.dict(),
+                    "main_task_context": main_task_context
+                })
+            else:
+                specialist = MergedSpecialistAgent(
+                    f"specialist_{i}",
+                    " + ".join(f"{s.role.value.title()}" for s in group) + " Specialists",
+                    [s.role for s in group],
+                    tenant_id
+                )
+                task = specialist.execute({
+                    "subtasks": [s.dict() for s in group],
+                    "main_task_context": main_task_context
+                })
+            specialist_tasks.append(task)
+
+        # Execute all specialists in parallel
+        results = await asyncio.gather(*specialist_tasks)
+
+        by_id = {}
+        for result in results:
+            for solution in result.get("solutions", [result]):
+                by_id[solution.get("subtask_id")] = solution
+
+        missing = [s for s in subtasks if not by_id[s.id].get("solution")] if merge else []
+        if missing:
+            print(f"Merged answer missed {len(missing)} sections, re-running individually")
+            retries = await TaskOrchestrator.run_specialists(missing, main_task_context, tenant_id)
+            for solution in retries:
+                by_id[solution.get("subtask_id")] = {**solution, "merge_fallback": True}
+
+        return [by_id[subtask.id] for subtask in subtasks]
+
     @staticmethod
     async def execute_workflow(task_data: StartTaskRequest):
         """Execute the complete multi-agent workflow"""
         task_id = task_data.taskId
+        tenant_id = resolve_tenant(task_data.tenantId, task_data.userId)
+        current_task_id.set(task_id)
+        capture.record_task(task_id, tenant_id, task_data.title, task_data.description, task_data.priority)
 
         try:
+            ledger.check_budget(tenant_id)
+
             # Stage 1: Manager analyzes task
             print(f"[{task_id}] Stage 1: Task Analysis")
             await backend.update_task(task_id, "analyzing")
             await backend.broadcast_event(task_id, "task:status_changed", "Анализ задачи менеджером")
 
-            manager = ManagerAgent("manager_1", "AI Менеджер")
+            manager = ManagerAgent("manager_1", "AI Менеджер", tenant_id)
             analysis = await manager.execute({
                 "action": "analyze",
                 "title": task_data.title,
@@ -91,22 +183,13 @@ class TaskOrchestrator:
             await backend.update_task(task_id, "executing")
             await backend.broadcast_event(task_id, "task:status_changed", f"Выполнение {len(subtasks)} специалистами")
 
-            specialist_tasks = []
-            for i, subtask in enumerate(subtasks):
-                specialist = SpecialistAgent(
-                    f"specialist_{i}",
-                    f"{subtask.role.value.title()} Specialist",
-                    subtask.role
-                )
-
-                task = specialist.execute({
-                    "subtask": subtask.dict(),
-                    "main_task_context": f"{task_data.title}: {task_data.description}"
-                })
-                specialist_tasks.append(task)
-
-            # Execute all specialists in parallel
-            solutions = await asyncio.gather(*specialist_tasks)
+            solutions = await TaskOrchestrator.run_specialists(
+                subtasks,
+                f"{task_data.title}: {task_data.description}",
+                tenant_id,
+                merge=MERGE_ENABLED,
+                complexity=analysis.get("complexity", "medium")
+            )
             print(f"[{task_id}] All specialists completed")
 
             # Stage 4: Manager reviews solutions
@@ -132,7 +215,7 @@ class TaskOrchestrator:
             await backend.update_task(task_id, "coordinating")
             await backend.broadcast_event(task_id, "task:status_changed", "Координация решений")
 
-            coordinator = CoordinatorAgent("coordinator_1", "Координатор")
+            coordinator = CoordinatorAgent("coordinator_1", "Координатор", tenant_id)
             coordination_result = await coordinator.execute({
                 "task": {
                     "title": task_data.title,
@@ -148,7 +231,7 @@ class TaskOrchestrator:
             await backend.update_task(task_id, "synthesizing")
             await backend.broadcast_event(task_id, "task:status_changed", "Синтез итогового ответа")
 
-            analyst = AnalystAgent("analyst_1", "Главный Аналитик")
+            analyst = AnalystAgent("analyst_1", "Главный Аналитик", tenant_id)
             analysis_result = await analyst.execute({
                 "task": {
                     "title": task_data.title,
@@ -200,7 +283,7 @@ class TaskOrchestrator:
 @router.post("/start")
 async def start_task(request: StartTaskRequest):
     """Start multi-agent workflow for a task"""
-    print(f"Starting workflow for task: {request.taskId}")
+    print(f"Starting workflow for task: {request.taskId} (tenant: {resolve_tenant(request.tenantId, request.userId)})")
 
     # Run workflow in background
     asyncio.create_task(TaskOrchestrator.execute_workflow(request))
@@ -232,7 +315,9 @@ Revision feedback:
 
 Please improve the answer based on the feedback above.
 """,
-        priority="high"
+        priority="high",
+        userId=request.userId,
+        tenantId=request.tenantId
     )
 
     asyncio.create_task(TaskOrchestrator.execute_workflow(start_request))
@@ -242,3 +327,22 @@ Please improve the answer based on the feedback above.
         "taskId": request.taskId,
         "message": "Revision workflow started"
     }
+
+
+@router.get("/usage/{tenant_id}")
+async def get_usage(tenant_id: str):
+    """Token/cost usage and budget for a tenant, plus scheduler load"""
+    return {
+        "success": True,
+        "usage": ledger.summary(tenant_id),
+        "scheduler": scheduler.stats()
+    }
+
+
+@router.get("/completion-stats")
+async def get_completion_stats():
+    """Learned completion lengths used for adaptive max_tokens"""
+    return {
+        "success": True,
+        "stats": completion_stats.snapshot()
+    }
@@ -0,0 +1,251 @@
+"""
+Offline replay of a provider capture against the orchestrator.
+
+Tasks from the capture are started at their original relative arrival times
+(divided by --speed). Provider calls are answered from the capture with the
+recorded response, token usage and latency (also divided by --speed), so the
+workflow, scheduler, budgets and max_tokens logic run on the real workload
+shape without network access. Backend status updates are discarded.
+
+Calls are matched to the recorded run (workflow start) they belong to. If a
+call asks for fewer max_tokens than the recorded completion used, the reply
+is truncated to that limit and the remainder is served to the continuation,
+so changes to max_tokens budgeting show up in the replay.
+
+Record a capture by setting PROVIDER_CAPTURE_PATH on the orchestration service.
+
+Usage (from backend/orchestration):
+    python -m benchmarks.replay capture.jsonl --speed 4
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from types import SimpleNamespace
+from typing import Dict, Any, List, Optional
+
+from app.models.task import StartTaskRequest
+from app.services.capture import capture, load_capture, current_call
+from app.services.clients import install_clients
+from app.services.usage import ledger, scheduler
+from app.workflows import orchestrator
+
+
+# Recorded run being replayed by the current workflow
+replay_run_id: ContextVar[Optional[str]] = ContextVar("replay_run_id", default=None)
+
+
+class ReplayStore:
+    """
+    Recorded calls keyed by (run, stage, role), with a per-(stage, role) fallback.
+
+    When the orchestrator asks for fewer tokens than a recorded call produced,
+    the response is cut to the requested max_tokens and marked truncated; the
+    rest is served to the continuation call that follows. A fresh call asking
+    for more tokens right after such a cut is a structured-stage retry and
+    gets the full recorded response.
+    """
+
+    def __init__(self, calls: List[Dict[str, Any]], speed: float):
+        self.speed = speed
+        self.by_run = defaultdict(deque)
+        self.by_shape = defaultdict(list)
+        self._fallback_index = defaultdict(int)
+        self._remainders: Dict[tuple, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.simulated_truncations = 0
+        for call in calls:
+            key = (call.get("stage"), call.get("role"))
+            self.by_run[(call.get("run_id"),) + key].append(call)
+            self.by_shape[key].append(call)
+
+    def next_call(self, key: tuple, continuation: bool) -> Dict[str, Any]:
+        queue = self.by_run.get(key)
+        while queue and not continuation and queue[0].get("continuation"):
+            # Recorded follow-up that this replay did not ask for
+            queue.popleft()
+        if queue:
+            self.hits += 1
+            return queue.popleft()
+
+        self.misses += 1
+        pool = self.by_shape.get(key[1:])
+        if not pool:
+            return {"response": "{}", "finish_reason": "stop", "input_tokens": 0, "output_tokens": 0, "latency_ms": 0}
+        index = self._fallback_index[key[1:]]
+        self._fallback_index[key[1:]] += 1
+        return pool[index % len(pool)]
+
+    def _truncate(self, key: tuple, call: Dict[str, Any], max_tokens: int, truncated_reason: str) -> Dict[str, Any]:
+        output_tokens = call.get("output_tokens") or 0
+        if not max_tokens or output_tokens <= max_tokens:
+            return call
+
+        self.simulated_truncations += 1
+        ratio = max_tokens / output_tokens
+        text = call.get("response") or ""
+        cut = int(len(text) * ratio)
+        latency = call.get("latency_ms") or 0
+        self._remainders[key] = {
+            **call,
+            "response": text[cut:],
+            "output_tokens": output_tokens - max_tokens,
+            "latency_ms": latency * (1 - ratio),
+            "_original": call,
+            "_requested": max_tokens,
+        }
+        return {
+            **call,
+            "response": text[:cut],
+            "output_tokens": max_tokens,
+            "latency_ms": latency * ratio,
+            "finish_reason": truncated_reason,
+        }
+
+    async def respond(self, max_tokens: int, continuation: bool, truncated_reason: str) -> Dict[str, Any]:
+        stage, role = current_call.get() or (None, None)
+        key = (replay_run_id.get(), stage, role)
+
+        call = self._remainders.pop(key, None)
+        if call is not None and not continuation:
+            # Retry of the cut call at a higher limit, or an unrelated call
+            call = call["_original"] if max_tokens and max_tokens > call["_requested"] else None
+        if call is None:
+            call = self.next_call(key, continuation)
+        call = self._truncate(key, call, max_tokens, truncated_reason)
+
+        await asyncio.sleep((call.get("latency_ms") or 0) / 1000 / self.speed)
+        return call
+
+
+class ReplayOpenAI:
+    def __init__(self, store: ReplayStore):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.base_url = "replay://openai"
+        self._store = store
+
+    async def _create(self, **kwargs):
+        call = await self._store.respond(
+            kwargs.get("max_tokens"),
+            continuation=len(kwargs.get("messages", [])) > 1,
+            truncated_reason="length",
+        )
+        return SimpleNamespace(
+            choices=[SimpleNamespace(
+                message=SimpleNamespace(content=call.get("response") or ""),
+                finish_reason=call.get("finish_reason") or "stop",
+            )],
+            usage=SimpleNamespace(
+                prompt_tokens=call.get("input_tokens") or 0,
+                completion_tokens=call.get("output_tokens") or 0,
+            ),
+        )
+
+
+class ReplayAnthropic:
+    def __init__(self, store: ReplayStore):
+        self.messages = SimpleNamespace(create=self._create)
+        self.base_url = "replay://anthropic"
+        self._store = store
+
+    async def _create(self, **kwargs):
+        messages = kwargs.get("messages", [])
+        call = await self._store.respond(
+            kwargs.get("max_tokens"),
+            continuation=bool(messages) and messages[-1].get("role") == "assistant",
+            truncated_reason="max_tokens",
+        )
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=call.get("response") or "")],
+            stop_reason=call.get("finish_reason") or "end_turn",
+            usage=SimpleNamespace(
+                input_tokens=call.get("input_tokens") or 0,
+                output_tokens=call.get("output_tokens") or 0,
+            ),
+        )
+
+
+class OfflineBackend:
+    """Stands in for the API service; keeps the last status per replayed run"""
+
+    def __init__(self):
+        self.statuses: Dict[str, str] = {}
+
+    async def update_task(self, task_id: str, status: str, data: Dict = None):
+        self.statuses[replay_run_id.get() or task_id] = status
+
+    async def broadcast_event(self, task_id: str, event_type: str, message: str, data: Dict = None):
+        pass
+
+
+async def _run_task(task: Dict[str, Any], delay: float, durations: Dict[str, float]):
+    await asyncio.sleep(delay)
+    replay_run_id.set(task.get("run_id"))
+    started = time.perf_counter()
+    await orchestrator.TaskOrchestrator.execute_workflow(StartTaskRequest(
+        taskId=task["task_id"],
+        title=task.get("title") or "",
+        description=task.get("description") or "",
+        priority=task.get("priority") or "medium",
+        tenantId=task.get("tenant_id"),
+    ))
+    durations[task.get("run_id")] = time.perf_counter() - started
+
+
+async def replay(path: str, speed: float) -> Dict[str, Any]:
+    records = load_capture(path)
+    tasks = [r for r in records if r.get("type") == "task"]
+    calls = [r for r in records if r.get("type") == "call"]
+    if not tasks:
+        raise SystemExit(f"No task records in {path}")
+
+    # Never append the replay's own synthetic traffic to a capture file
+    capture.path = None
+
+    store = ReplayStore(calls, speed)
+    install_clients(ReplayOpenAI(store), ReplayAnthropic(store))
+    backend = OfflineBackend()
+    orchestrator.backend = backend
+
+    first_ts = min(t["ts"] for t in tasks)
+    durations: Dict[str, float] = {}
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        _run_task(task, (task["ts"] - first_ts) / speed, durations)
+        for task in tasks
+    ])
+    wall = time.perf_counter() - started
+
+    tenants = sorted({t.get("tenant_id") or "default" for t in tasks})
+    ordered = sorted(durations.values())
+    return {
+        "capture": path,
+        "speed": speed,
+        "tasks": len(tasks),
+        "recorded_calls": len(calls),
+        "replayed_hits": store.hits,
+        "replayed_misses": store.misses,
+        "simulated_truncations": store.simulated_truncations,
+        "wall_seconds": round(wall, 2),
+        "task_seconds_p50": round(ordered[len(ordered) // 2], 2),
+        "task_seconds_max": round(ordered[-1], 2),
+        "statuses": {s: list(backend.statuses.values()).count(s) for s in set(backend.statuses.values())},
+        "scheduler": scheduler.stats(),
+        "usage": {t: ledger.summary(t)["totals"] for t in tenants},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a provider capture offline")
+    parser.add_argument("capture", help="JSONL file written via PROVIDER_CAPTURE_PATH")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time compression factor (1x-Nx)")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(replay(args.capture, args.speed)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
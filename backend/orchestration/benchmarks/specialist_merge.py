@@ -0,0 +1,124 @@
+"""
+Compare merged and unmerged specialist execution on live providers.
+
+For each sample task the manager analyses it and creates subtasks once. The
+specialist stage then runs twice, once per call and once with compatible
+subtasks merged. Each run is followed by the manager's per-solution review.
+Reported per mode: specialist calls, input/output tokens, stage latency and
+mean review quality score. The merged mode also reports how many merged calls
+failed to return every section and had subtasks re-run individually.
+
+Requires OPENAI_API_KEY. Usage (from backend/orchestration):
+    python -m benchmarks.specialist_merge
+    python -m benchmarks.specialist_merge --tasks tasks.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, Any, List
+
+from app.agents.manager import ManagerAgent
+from app.agents.specialist import group_subtasks, MERGE_COMPLEXITIES
+from app.services.usage import ledger
+from app.workflows.orchestrator import TaskOrchestrator
+
+SAMPLE_TASKS = [
+    {
+        "title": "Пресс-релиз о запуске продукта",
+        "description": "Подготовить пресс-релиз и краткий анализ целевой аудитории для запуска мобильного приложения доставки цветов",
+    },
+    {
+        "title": "Документация REST API",
+        "description": "Описать эндпоинты сервиса бронирования столиков и составить чек-лист тестирования",
+    },
+    {
+        "title": "Исследование рынка",
+        "description": "Кратко исследовать рынок онлайн-курсов по программированию в России и описать ключевые сегменты",
+    },
+]
+
+
+async def _run_mode(task: Dict[str, str], subtasks, complexity: str, merge: bool) -> Dict[str, Any]:
+    tenant_id = f"bench_{'merged' if merge else 'unmerged'}"
+    before = dict(ledger.summary(tenant_id)["totals"])
+
+    started = time.perf_counter()
+    solutions = await TaskOrchestrator.run_specialists(
+        subtasks,
+        f"{task['title']}: {task['description']}",
+        tenant_id,
+        merge=merge,
+        complexity=complexity
+    )
+    latency = time.perf_counter() - started
+    after = ledger.summary(tenant_id)["totals"]
+
+    groups = [g for g in group_subtasks(subtasks, complexity) if len(g) > 1] if merge else []
+    fallback_ids = {s.get("subtask_id") for s in solutions if s.get("merge_fallback")}
+
+    reviewer = ManagerAgent("bench_reviewer", "Benchmark Reviewer")
+    scores = []
+    for subtask, solution in zip(subtasks, solutions):
+        review = await reviewer.execute({
+            "action": "review_solution",
+            "subtask": subtask.dict(),
+            "solution": solution.get("solution")
+        })
+        try:
+            scores.append(float(review.get("quality_score", 0)))
+        except (TypeError, ValueError):
+            pass
+
+    return {
+        "calls": after["calls"] - before.get("calls", 0),
+        "input_tokens": after["input_tokens"] - before.get("input_tokens", 0),
+        "output_tokens": after["output_tokens"] - before.get("output_tokens", 0),
+        "latency_seconds": round(latency, 2),
+        "quality_score": round(statistics.mean(scores), 2) if scores else None,
+        "merged_calls": len(groups),
+        "merged_calls_failed": sum(1 for g in groups if any(s.id in fallback_ids for s in g)),
+        "fallback_subtasks": len(fallback_ids),
+    }
+
+
+async def run(tasks: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    manager = ManagerAgent("bench_manager", "Benchmark Manager")
+    results = []
+    for task in tasks:
+        analysis = await manager.execute({"action": "analyze", "priority": "medium", **task})
+        subtasks = (await manager.execute({
+            "action": "create_subtasks",
+            "specialists": analysis.get("required_specialists", []),
+            **task
+        })).get("subtasks", [])
+
+        # Use a mergeable complexity regardless of the analysis so both modes
+        # run on the same subtasks
+        complexity = sorted(MERGE_COMPLEXITIES)[0]
+        results.append({
+            "title": task["title"],
+            "subtasks": len(subtasks),
+            "merged_groups": len(group_subtasks(subtasks, complexity)),
+            "unmerged": await _run_mode(task, subtasks, complexity, merge=False),
+            "merged": await _run_mode(task, subtasks, complexity, merge=True),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merged vs unmerged specialist benchmark")
+    parser.add_argument("--tasks", help="JSON file with a list of {title, description}")
+    args = parser.parse_args()
+
+    tasks = SAMPLE_TASKS
+    if args.tasks:
+        with open(args.tasks, encoding="utf-8") as f:
+            tasks = json.load(f)
+
+    print(json.dumps(asyncio.run(run(tasks)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Cold start benchmark for the orchestration service.
+
+Measures, in fresh interpreters:
+- import time of app.main
+- time until /ready returns 200 (import + connection warm-up)
+- warm-up time as reported by /ready
+- latency of the first real request through the shared provider and backend
+  pools, sent after an idle gap following readiness (as when a pod turns
+  ready and waits for traffic)
+
+The first-request number shows whether warmed connections survive until
+traffic arrives; compare against WARMUP_ENABLED=false to see the gain.
+
+Usage (from backend/orchestration):
+    python -m benchmarks.startup --runs 5 --idle-gap 30
+    WARMUP_ENABLED=false python -m benchmarks.startup
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+IMPORT_SNIPPET = """
+import json
+import time
+t0 = time.perf_counter()
+import app.main
+print(json.dumps({"import_app": time.perf_counter() - t0}))
+"""
+
+FIRST_REQUEST_SNIPPET = """
+import json
+import time
+t0 = time.perf_counter()
+from fastapi.testclient import TestClient
+import app.main
+from app.services.clients import get_http_client, get_openai_client, get_anthropic_client
+from app.workflows.orchestrator import backend
+
+async def first_requests():
+    # One request through each warmed pool; any HTTP response counts
+    timings = {{}}
+    http_client = get_http_client()
+    for name, url in (("openai", get_openai_client().base_url), ("anthropic", get_anthropic_client().base_url)):
+        started = time.perf_counter()
+        await http_client.head(str(url))
+        timings[name] = time.perf_counter() - started
+    started = time.perf_counter()
+    await backend.client.head("/")
+    timings["backend"] = time.perf_counter() - started
+    return timings
+
+with TestClient(app.main.app) as client:
+    while True:
+        response = client.get("/ready")
+        if response.status_code == 200:
+            break
+        assert time.perf_counter() - t0 < 120, "service did not become ready"
+        time.sleep(0.01)
+    ready = time.perf_counter() - t0
+    warmup = response.json().get("warmupSeconds") or 0.0
+
+    time.sleep({idle_gap})
+    timings = client.portal.call(first_requests)
+
+print(json.dumps({{
+    "time_to_ready": ready,
+    "warmup": warmup,
+    **{{f"first_request_{{name}}": value for name, value in timings.items()}},
+}}))
+"""
+
+
+def _run(snippet: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", snippet],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _summary(samples):
+    return {
+        "runs": len(samples),
+        "min_ms": round(min(samples) * 1000, 1),
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Orchestration cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--idle-gap", type=float, default=30.0,
+                        help="Seconds between readiness and the first request")
+    args = parser.parse_args()
+
+    samples = [_run(IMPORT_SNIPPET) for _ in range(args.runs)]
+    samples += [_run(FIRST_REQUEST_SNIPPET.format(idle_gap=args.idle_gap)) for _ in range(args.runs)]
+
+    results = {"idle_gap_seconds": args.idle_gap}
+    for metric in sorted({key for sample in samples for key in sample}):
+        results[metric] = _summary([sample[metric] for sample in samples if metric in sample])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()